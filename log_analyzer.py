@@ -14,22 +14,47 @@ Example of allowed log names:
 
 import datetime as dt
 import gzip
+import heapq
+import io
 import json
 import logging
+import mmap
+import multiprocessing
 import os
 import re
 import sys
 
 from argparse import ArgumentParser
-from collections import defaultdict, namedtuple
-from operator import attrgetter
-from string import Template
+from array import array
+from collections import defaultdict, deque, namedtuple
+from contextlib import closing
+from functools import partial
 
 try:
     from ConfigParser import SafeConfigParser
 except ImportError:
     from configparser import SafeConfigParser
 
+try:
+    from isal import igzip
+except ImportError:
+    igzip = None
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import rapidgzip
+except ImportError:
+    rapidgzip = None
+
 
 DEFAULT_CONFIG = {
     "REPORT_SIZE": 1000,
@@ -37,19 +62,36 @@ DEFAULT_CONFIG = {
     "LOG_DIR": "./log",
     "ALLOWED_INVALID_RECORDS_PART": 0.2,
     "LOGGING": "INFO",
+    "WORKERS": 1,
 }
 
 DEFAULT_CONFIG_FILE_PATH = os.path.abspath(
     os.path.join(os.path.dirname(__file__), "config.ini")
 )
 
-LOG_FILENAME_PATTERN = re.compile(r"^nginx-access-ui\.log-(\d{8})\.(gz|log)$")
-LOG_REQUEST_PATTERN = re.compile(r"^.+\[.+\] \"(.+)\" \d{3}.+ (\d+\.\d+)\n$")
+LOG_FILENAME_PREFIX = "nginx-access-ui.log-"
+LOG_FILENAME_PATTERN = re.compile(r"nginx-access-ui\.log-(\d{8})\.(gz|log)$")
+
+READ_CHUNK_SIZE = 4 * 1024 * 1024
+PARALLEL_CHUNK_SIZE = 64 * 1024 * 1024
+
+# The part of invalid rows is also checked while the log-file is read,
+# once enough rows are seen, to fail fast on logs of a wrong format.
+# The check runs after every part of `PARALLEL_CHUNK_SIZE` bytes
+# for any number of workers. The margin avoids false alarms on logs
+# with uneven invalid rows.
+EARLY_CHECK_MIN_ROWS = 100000
+EARLY_CHECK_MARGIN = 1.5
 
 TEMPLATE = os.path.abspath(
     os.path.join(os.path.dirname(__file__), "templates", "report.html")
 )
 
+# The template is split once around the placeholder for stats,
+# so reports are written without rescanning it.
+with open(TEMPLATE, "rb") as _template:
+    TEMPLATE_HEAD, TEMPLATE_TAIL = _template.read().split(b"$table_json", 1)
+
 
 LogFile = namedtuple("LogFile", ["path", "date", "extension"])
 LogRequest = namedtuple("LogRequest", ["url", "time"])
@@ -123,10 +165,13 @@ def main():
         "main", "ALLOWED_INVALID_RECORDS_PART"
     )
 
+    workers = config.getint("main", "WORKERS")
+
     request_stats = get_request_stats(
         most_recent_log,
         count=report_size,
         allowed_invalid_part=allowed_invalid_records_part,
+        workers=workers,
     )
 
     if not request_stats:
@@ -141,6 +186,30 @@ def main():
     logging.debug("Report has been successfully generated.")
 
 
+def _iterate_over_filenames(directory):
+    """Yields names of regular files in specified directory.
+
+    Parameters
+    ----------
+    directory : str
+        Path to directory.
+
+    Yields
+    -------
+    str
+        Name of a file.
+    """
+    if not hasattr(os, "scandir"):
+        # Python 2.7
+        for filename in os.listdir(directory):
+            yield filename
+        return
+
+    for entry in os.scandir(directory):
+        if entry.is_file():
+            yield entry.name
+
+
 def find_most_recent_log(directory):
     """Finds most recent log in specified directory.
 
@@ -163,34 +232,255 @@ def find_most_recent_log(directory):
     if not os.path.isdir(directory):
         raise TypeError("Can't find {0} directory with logs".format(directory))
 
-    most_recent_date = None
-    most_recent_filename = None
-    most_recent_ext = None
+    candidates = []
 
-    for filename in os.listdir(directory):
-        search = LOG_FILENAME_PATTERN.search(filename)
-        if search is None:
+    for filename in _iterate_over_filenames(directory):
+        if not filename.startswith(LOG_FILENAME_PREFIX):
             continue
 
-        raw_date, extension = search.groups()
+        match = LOG_FILENAME_PATTERN.match(filename)
+        if match is None:
+            continue
+
+        raw_date, extension = match.groups()
+        candidates.append((raw_date, filename, extension))
+
+    # Dates have fixed width, so raw dates are compared as strings
+    # and only the most recent ones are parsed and validated.
+    for raw_date, filename, extension in sorted(candidates, reverse=True):
         try:
-            date = dt.datetime.strptime(raw_date, "%Y%m%d")
+            date = dt.datetime(
+                int(raw_date[:4]), int(raw_date[4:6]), int(raw_date[6:])
+            )
         except ValueError:
             continue
 
-        if most_recent_date is None or date > most_recent_date:
-            most_recent_date = date
-            most_recent_filename = filename
-            most_recent_ext = extension
+        return LogFile(
+            path=os.path.abspath(os.path.join(directory, filename)),
+            date=date,
+            extension=extension,
+        )
+
+    return None
+
 
-    if most_recent_date is None:
+def _parse_line(line):
+    """Extracts requested URL and request time from a raw log line.
+
+    The line is scanned with plain byte searches instead of a regular
+    expression: the quoted `$request` follows the `] "` sequence,
+    a three-digit `$status` follows the `$request` and `$request_time`
+    is the last field of the line.
+
+    Parameters
+    ----------
+    line : bytes
+        Raw line of the log-file.
+
+    Returns
+    -------
+    Optional[Tuple[bytes, float]]
+        Raw requested URL and request time or None (for invalid rows).
+    """
+    request_start = line.find(b'] "')
+    if request_start == -1:
         return None
 
-    return LogFile(
-        path=os.path.abspath(os.path.join(directory, most_recent_filename)),
-        date=most_recent_date,
-        extension=most_recent_ext,
-    )
+    request_start += 3
+    request_end = line.find(b'"', request_start)
+    if request_end == -1:
+        return None
+
+    request = line[request_start:request_end].split()
+    if len(request) != 3:
+        # Invalid $request format
+        return None
+
+    # $status: three digits right after the quoted $request
+    status = line[request_end + 1 : request_end + 5]
+    if len(status) != 4 or status[:1] != b" " or not status[1:].isdigit():
+        return None
+
+    time_start = line.rfind(b" ", request_end + 6)
+    if time_start == -1:
+        return None
+
+    # $request_time is accepted only in the `\d+\.\d+` form
+    time_field = line[time_start + 1 :].rstrip(b"\n")
+    seconds, dot, fraction = time_field.partition(b".")
+    if not (dot and seconds.isdigit() and fraction.isdigit()):
+        return None
+
+    return request[1], float(time_field)
+
+
+def _open_log(log):
+    """Opens specified log-file for reading in binary mode.
+
+    Plain logs are memory-mapped. Gzipped logs are decompressed
+    in parallel with `rapidgzip` or with ISA-L (`isal` package)
+    if they are installed.
+
+    Parameters
+    ----------
+    log : LogFile
+        Named tuple that describes log-file.
+
+    Returns
+    -------
+    file object or mmap.mmap
+
+    Raises
+    ------
+    ValueError
+        If log-file has invalid extension.
+    IOError
+        Could not open the log-file.
+    """
+    if log.extension == "log":
+        with open(log.path, "rb") as f:
+            try:
+                mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Empty files can't be mapped
+                return io.BytesIO()
+
+        if hasattr(mapping, "madvise"):
+            mapping.madvise(mmap.MADV_SEQUENTIAL)
+        return mapping
+
+    if log.extension == "gz":
+        # rapidgzip pays off only if there are cores to decompress on
+        if rapidgzip is not None and (os.cpu_count() or 1) > 1:
+            return io.BufferedReader(
+                rapidgzip.open(log.path, parallelization=os.cpu_count())
+            )
+        if igzip is not None:
+            return igzip.open(log.path, "rb")
+        return gzip.open(log.path, "rb")
+
+    raise ValueError("Invalid extension of the log-file.")
+
+
+def _iterate_over_line_ranges(
+    mapping, chunk_size=READ_CHUNK_SIZE, start=0, stop=None
+):
+    """Yields boundaries of blocks of whole lines of memory-mapped file.
+
+    Parameters
+    ----------
+    mapping : mmap.mmap
+        Memory-mapped file.
+    chunk_size : int
+        Approximate size of a block.
+    start : int
+        Offset of the first line to split.
+    stop : Optional[int]
+        Offset of the end of the last line to split (the whole file
+        if it is not specified).
+
+    Yields
+    -------
+    Tuple[int, int]
+        Start and end offsets of a block, the trailing newline
+        is not included.
+    """
+    if stop is None:
+        stop = len(mapping)
+        if mapping[stop - 1 : stop] == b"\n":
+            stop -= 1
+
+    while start < stop:
+        end = start + chunk_size
+        if end < stop:
+            end = mapping.find(b"\n", end, stop)
+        if end == -1 or end >= stop:
+            end = stop
+
+        yield start, end
+        start = end + 1
+
+
+def _iterate_over_mapped_chunks(mapping, chunk_size=READ_CHUNK_SIZE):
+    """Yields blocks of whole lines of specified memory-mapped file.
+
+    Blocks are sliced at line boundaries right from the mapping,
+    so incomplete lines are never copied twice.
+
+    Parameters
+    ----------
+    mapping : mmap.mmap
+        Memory-mapped file.
+    chunk_size : int
+        Approximate size of a block.
+
+    Yields
+    -------
+    bytes
+        Block of lines separated by newlines, without the trailing one.
+    """
+    for start, end in _iterate_over_line_ranges(mapping, chunk_size):
+        yield mapping[start:end]
+
+
+def _iterate_over_chunks(f, chunk_size=READ_CHUNK_SIZE):
+    """Yields blocks of whole lines of specified file.
+
+    Parameters
+    ----------
+    f : file object or mmap.mmap
+        File opened in binary mode.
+    chunk_size : int
+        Number of bytes to read at once.
+
+    Yields
+    -------
+    bytes
+        Block of lines separated by newlines, without the trailing one.
+    """
+    if isinstance(f, mmap.mmap):
+        for chunk in _iterate_over_mapped_chunks(f, chunk_size):
+            yield chunk
+        return
+
+    tail = b""
+
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            break
+
+        chunk = tail + chunk
+        last_newline = chunk.rfind(b"\n")
+        if last_newline == -1:
+            tail = chunk
+            continue
+
+        tail = chunk[last_newline + 1 :]
+        yield chunk[:last_newline]
+
+    if tail:
+        yield tail
+
+
+def _iterate_over_lines(f, chunk_size=READ_CHUNK_SIZE):
+    """Yields lines of specified file reading it in large chunks.
+
+    Parameters
+    ----------
+    f : file object
+        File opened in binary mode.
+    chunk_size : int
+        Number of bytes to read at once.
+
+    Yields
+    -------
+    bytes
+        Line without the trailing newline.
+    """
+    for chunk in _iterate_over_chunks(f, chunk_size):
+        for line in chunk.split(b"\n"):
+            yield line
 
 
 def _iterate_over_requests(log):
@@ -212,51 +502,223 @@ def _iterate_over_requests(log):
         If log-file has invalid extension.
     IOError
         Could not open the log-file.
+    UnicodeDecodeError
+        Requested URL is not a valid UTF-8 string.
     """
-    if log.extension not in {"log", "gz"}:
-        raise ValueError("Invalid extension of the log-file.")
+    with closing(_open_log(log)) as f:
+        for line in _iterate_over_lines(f):
+            request = _parse_line(line)
+            if request is None:
+                yield None
+                continue
 
-    open_method = open if log.extension == "log" else gzip.open
+            url, time = request
+            yield LogRequest(url.decode("utf-8"), time)
 
-    with open_method(log.path, "rb") as f:
-        for line in f:
-            line = line.decode("utf-8")
-            search = LOG_REQUEST_PATTERN.search(line)
 
-            if search is None:
-                yield None
-                continue
+def _median(values):
+    """Returns median value for specified list.
 
-            try:
-                method, url, protocol = search.group(1).split()
-            except ValueError:
-                # Invalid $request format
-                yield None
-                continue
+    If numpy is installed, long lists are partitioned in linear time
+    instead of being sorted.
+
+    Parameters
+    ----------
+    values: Sequence[float]
 
-            time = float(search.group(2))
+    Returns
+    -------
+    float
+    """
+    assert len(values), "List is empty"
 
-            yield LogRequest(url, time)
+    n_items = len(values)
+    low, high = (n_items - 1) // 2, n_items // 2
 
+    # Sorting is faster than a numpy call for short lists
+    if numpy is not None and n_items >= 100:
+        values = numpy.partition(values, [low, high])
+    else:
+        values = sorted(values)
 
-def _median(sorted_list):
-    """Returns median value for specified sorted list.
+    return 0.5 * float(values[low] + values[high])
+
+
+def _aggregate_lines(lines, times=None):
+    """Aggregates time statistics for requests in specified lines.
 
     Parameters
     ----------
-    arr: List[float]
+    lines : Iterable[bytes]
+        Raw lines of a log-file.
+    times : Optional[Dict[bytes, array]]
+        Mapping to collect request times into. A new one is created
+        if it is not specified.
 
     Returns
     -------
-    float
+    Tuple[float, float, float, Dict[bytes, array]]
+        Number of valid rows,
+        Number of invalid rows,
+        Overall time,
+        Times for each raw requested URL (arrays of doubles).
     """
-    assert sorted_list, "List is empty"
+    count_valid = 0.0
+    count_invalid = 0.0
 
-    n_items = len(sorted_list)
-    return 0.5 * (sorted_list[(n_items - 1) // 2] + sorted_list[n_items // 2])
+    time_valid = 0.0
+    if times is None:
+        # Arrays of doubles keep samples unboxed: 8 bytes per time value
+        # instead of a pointer plus a float object.
+        times = defaultdict(partial(array, "d"))
+
+    # Parsing and aggregation are done in a single loop
+    # to avoid a generator round-trip for every line.
+    parse_line = _parse_line
+    get_times = times.__getitem__
+
+    for line in lines:
+        request = parse_line(line)
+        if request is None:
+            count_invalid += 1
+            continue
 
+        url, time = request
+        count_valid += 1
+        time_valid += time
+        get_times(url).append(time)
+
+    return count_valid, count_invalid, time_valid, times
+
+
+def _aggregate_chunk(chunk):
+    """Aggregates time statistics for requests in a block of lines.
+
+    Runs in worker processes, see `_aggregate_in_parallel`.
+
+    Parameters
+    ----------
+    chunk : bytes
+        Block of lines separated by newlines.
 
-def _aggregate_stats_by_url(log, allowed_invalid_part=0.2):
+    Returns
+    -------
+    Tuple[float, float, float, Dict[bytes, array]]
+        The same as `_aggregate_lines`.
+    """
+    return _aggregate_lines(chunk.split(b"\n"))
+
+
+def _aggregate_part(f, part, times):
+    """Aggregates time statistics for requests in a part of log-file.
+
+    The part is parsed in blocks of `READ_CHUNK_SIZE` bytes, so lines
+    of the whole part are never held in memory at once.
+
+    Parameters
+    ----------
+    f : file object or mmap.mmap
+        Log-file the part is taken from.
+    part : Union[bytes, Tuple[int, int]]
+        Block of lines separated by newlines or, for memory-mapped
+        files, its start and end offsets.
+    times : Dict[bytes, array]
+        Mapping to collect request times into.
+
+    Returns
+    -------
+    Tuple[float, float, float, Dict[bytes, array]]
+        The same as `_aggregate_lines`.
+    """
+    if isinstance(f, mmap.mmap):
+        # Blocks are sliced right from the mapping, the part is not copied
+        start, stop = part
+        chunks = (
+            f[chunk_start:chunk_end]
+            for chunk_start, chunk_end in _iterate_over_line_ranges(
+                f, READ_CHUNK_SIZE, start, stop
+            )
+        )
+    else:
+        chunks = _iterate_over_chunks(io.BytesIO(part), READ_CHUNK_SIZE)
+
+    count_valid = 0.0
+    count_invalid = 0.0
+    time_valid = 0.0
+
+    for chunk in chunks:
+        chunk_valid, chunk_invalid, chunk_time, _ = _aggregate_lines(
+            chunk.split(b"\n"), times
+        )
+        count_valid += chunk_valid
+        count_invalid += chunk_invalid
+        time_valid += chunk_time
+
+    return count_valid, count_invalid, time_valid, times
+
+
+def _aggregate_range(path, start, end):
+    """Aggregates time statistics for requests in a part of plain log-file.
+
+    Runs in worker processes, see `_aggregate_in_parallel`.
+
+    Parameters
+    ----------
+    path : str
+        Path to the plain log-file.
+    start : int
+        Offset of the first line of the part.
+    end : int
+        Offset of the end of the last line of the part.
+
+    Returns
+    -------
+    Tuple[float, float, float, Dict[bytes, array]]
+        The same as `_aggregate_lines`.
+    """
+    with open(path, "rb") as f:
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    with closing(mapping):
+        return _aggregate_chunk(mapping[start:end])
+
+
+def _aggregate_in_parallel(func, tasks, workers):
+    """Yields results of `func` for each task using a process pool.
+
+    At most `2 * workers` tasks are in flight, so memory usage
+    does not depend on the size of the log-file.
+
+    Parameters
+    ----------
+    func : Callable[..., Tuple[float, float, float, Dict[bytes, array]]]
+        `_aggregate_chunk` or `_aggregate_range`.
+    tasks : Iterable[tuple]
+        Arguments of `func` for each task.
+    workers : int
+        Number of worker processes.
+
+    Yields
+    -------
+    Tuple[float, float, float, Dict[bytes, array]]
+        The same as `_aggregate_lines`, in the order of tasks.
+    """
+    pool = multiprocessing.Pool(workers)
+    pending = deque()
+
+    try:
+        for args in tasks:
+            pending.append(pool.apply_async(func, args))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().get()
+
+        while pending:
+            yield pending.popleft().get()
+    finally:
+        pool.terminate()
+
+
+def _aggregate_stats_by_url(log, allowed_invalid_part=0.2, workers=1):
     """Aggregates time statistics for requests in specified log-file.
 
     Parameters
@@ -265,13 +727,15 @@ def _aggregate_stats_by_url(log, allowed_invalid_part=0.2):
         Named tuple that describes log-file.
     allowed_invalid_part: float
         Allowed part of invalid rows in the log-file.
+    workers: int
+        Number of processes to parse the log-file with.
 
     Returns
     -------
-    Tuple[float, float, Dict[str, List[float]]]
+    Tuple[float, float, Dict[str, array]]
         Number of valid rows,
         Overall time,
-        Times for each requested URL.
+        Times for each requested URL (arrays of doubles).
 
     Raises
     ------
@@ -281,22 +745,64 @@ def _aggregate_stats_by_url(log, allowed_invalid_part=0.2):
         If log-file has invalid extension.
     IOError
         Could not open the log-file.
+    UnicodeDecodeError
+        Requested URL is not a valid UTF-8 string.
     """
-
     count_valid = 0.0
     count_invalid = 0.0
-
     time_valid = 0.0
-    times = defaultdict(list)
-
-    for request in _iterate_over_requests(log):
-        if request is None:
-            count_invalid += 1
-            continue
-
-        count_valid += 1
-        time_valid += request.time
-        times[request.url].append(request.time)
+    times = defaultdict(partial(array, "d"))
+
+    with closing(_open_log(log)) as f:
+        # The log-file is cut into the same parts for any number
+        # of workers, so the early check below does not depend on it.
+        if isinstance(f, mmap.mmap):
+            chunks = _iterate_over_line_ranges(f, PARALLEL_CHUNK_SIZE)
+        else:
+            chunks = _iterate_over_chunks(f, PARALLEL_CHUNK_SIZE)
+
+        if workers > 1 and isinstance(f, mmap.mmap):
+            # Workers read their parts of a plain log-file by themselves,
+            # only offsets are sent to them.
+            parts = _aggregate_in_parallel(
+                _aggregate_range,
+                ((log.path, start, end) for start, end in chunks),
+                workers,
+            )
+        elif workers > 1:
+            parts = _aggregate_in_parallel(
+                _aggregate_chunk, ((chunk,) for chunk in chunks), workers
+            )
+        else:
+            # Parts are aggregated right into `times`, nothing to merge
+            parts = (_aggregate_part(f, chunk, times) for chunk in chunks)
+
+        with closing(parts):
+            for part_valid, part_invalid, part_time, part_times in parts:
+                count_valid += part_valid
+                count_invalid += part_invalid
+                time_valid += part_time
+
+                if part_times is times:
+                    pass
+                elif not times:
+                    times = part_times
+                else:
+                    for url, url_times in part_times.items():
+                        times[url].extend(url_times)
+
+                count_all = count_valid + count_invalid
+                if (
+                    count_all >= EARLY_CHECK_MIN_ROWS
+                    and count_invalid / count_all
+                    > EARLY_CHECK_MARGIN * allowed_invalid_part
+                ):
+                    raise ValueError("Too many invalid rows in the log-file.")
+
+    # URLs are decoded once per distinct URL, not once per line
+    times = {
+        url.decode("utf-8"): url_times for url, url_times in times.items()
+    }
 
     count_all = (count_invalid + count_valid) or 1.0
     if count_invalid / count_all > allowed_invalid_part:
@@ -305,7 +811,7 @@ def _aggregate_stats_by_url(log, allowed_invalid_part=0.2):
     return count_valid, time_valid, times
 
 
-def get_request_stats(log, count=1000, allowed_invalid_part=0.2):
+def get_request_stats(log, count=1000, allowed_invalid_part=0.2, workers=1):
     """Returns a list with statistical data for each requested URL.
 
     Parameters
@@ -316,6 +822,8 @@ def get_request_stats(log, count=1000, allowed_invalid_part=0.2):
         Return stats for `count` URLs
     allowed_invalid_part: float
         Allowed part of invalid rows in the log-file.
+    workers: int
+        Number of processes to parse the log-file with.
 
     Returns
     -------
@@ -332,16 +840,36 @@ def get_request_stats(log, count=1000, allowed_invalid_part=0.2):
         Could not open the log-file.
     """
 
-    count_valid, time_all, times = _aggregate_stats_by_url(
-        log, allowed_invalid_part
-    )
+    aggregate = _aggregate_stats_by_url(log, allowed_invalid_part, workers)
+    return _get_top_stats(aggregate, count)
+
+
+def _get_top_stats(aggregate, count=1000):
+    """Returns statistics for the `count` URLs with the largest `time_sum`.
+
+    Parameters
+    ----------
+    aggregate: Tuple[float, float, Dict[str, array]]
+        Result of `_aggregate_stats_by_url`.
+    count: int
+        Return stats for `count` URLs
+
+    Returns
+    -------
+    List[LogStat]
+        List of statistics for each requested URL sorted by `time_sum`
+    """
+    count_valid, time_all, times = aggregate
+
+    time_sums = {url: sum(url_times) for url, url_times in times.items()}
+    top_urls = heapq.nlargest(count, time_sums, key=time_sums.__getitem__)
 
     stats = []
 
-    for url in times:
-        url_count = len(times[url])
-        url_sorted_times = sorted(times[url])
-        url_time_sum = sum(times[url])
+    for url in top_urls:
+        url_times = times[url]
+        url_count = len(url_times)
+        url_time_sum = time_sums[url]
 
         url_stat = LogStat(
             url=url,
@@ -350,38 +878,61 @@ def get_request_stats(log, count=1000, allowed_invalid_part=0.2):
             time_sum=url_time_sum,
             time_perc=(100 * url_time_sum / time_all),
             time_avg=(url_time_sum / url_count),
-            time_max=url_sorted_times[-1],
-            time_med=_median(url_sorted_times),
+            time_max=max(url_times),
+            time_med=_median(url_times),
         )
         stats.append(url_stat)
 
-    return sorted(stats, key=attrgetter("time_sum"), reverse=True)[:count]
+    return stats
+
 
+def _encode_json(obj):
+    """Returns JSON representation of specified object.
 
-def _render(stats):
-    """Renders the default template with calculated stats.
+    Uses `orjson` if it is installed.
 
     Parameters
     ----------
-    stats: List[LogStat]
-        List of statistics for each URL.
+    obj: Any
+        JSON serializable object.
 
     Returns
     -------
-    str
-        String representation of rendered template
+    bytes
+        UTF-8 encoded JSON.
     """
-    with open(TEMPLATE, "rb") as f:
-        template = Template(f.read().decode("utf-8"))
+    if orjson is not None:
+        return orjson.dumps(obj)
+
+    return json.dumps(obj, separators=(",", ":")).encode("ascii")
 
-    return template.safe_substitute(
-        table_json=json.dumps([record._asdict() for record in stats])
-    )
+
+def _dump_stats(stats, f):
+    """Writes stats as a JSON array to specified file record by record.
+
+    Parameters
+    ----------
+    stats: List[LogStat]
+        List of statistics for each URL.
+    f: file object
+        File opened in binary mode.
+    """
+    f.write(b"[")
+
+    for index, record in enumerate(stats):
+        if index:
+            f.write(b",")
+        f.write(_encode_json(dict(zip(LogStat._fields, record))))
+
+    f.write(b"]")
 
 
 def write_report(stats, to):
     """Writes rendered report to specified file.
 
+    The template is written as is around the `$table_json` placeholder,
+    so the report is never held in memory as a whole.
+
     Parameters
     ----------
     stats: List[LogStat]
@@ -394,10 +945,10 @@ def write_report(stats, to):
     IOError
         Unable to write file
     """
-    rendered_template = _render(stats)
-
     with open(to, "wb") as f:
-        f.write(rendered_template.encode("utf-8"))
+        f.write(TEMPLATE_HEAD)
+        _dump_stats(stats, f)
+        f.write(TEMPLATE_TAIL)
 
 
 if __name__ == "__main__":
@@ -1,83 +1,89 @@
 import datetime as dt
+import gzip
+import io
+import json
+import random
+import shutil
+import tempfile
 import unittest
 import os
 
+from array import array
+from contextlib import closing
+
 from context import log_analyzer
 
 
 FIXTURES_PATH = os.path.join(
     os.path.dirname(os.path.abspath(__file__)), "fixtures"
 )
+VALID_FILENAMES_PATH = os.path.join(FIXTURES_PATH, "valid_filenames")
+
+LOG_PATH = os.path.join(
+    VALID_FILENAMES_PATH, "nginx-access-ui.log-20190102.log"
+)
+INVALID_LOG_PATH = os.path.join(
+    VALID_FILENAMES_PATH, "nginx-access-ui.log-20180101.log"
+)
+EMPTY_LOG_PATH = os.path.join(
+    VALID_FILENAMES_PATH, "nginx-access-ui.log-20170101.log"
+)
+ENCODING_LOG_PATH = os.path.join(
+    VALID_FILENAMES_PATH, "nginx-access-ui.log-20160101.log"
+)
 
 
 class TestCore(unittest.TestCase):
-    def setUp(self):
-        log_path = os.path.abspath(
-            os.path.join(
-                FIXTURES_PATH,
-                "valid_filenames",
-                "nginx-access-ui.log-20190102.log",
-            )
-        )
-        self.log = log_analyzer.LogFile(
-            path=log_path,
-            date=dt.datetime.strptime("20190102", "%Y%m%d"),
-            extension="log",
+    @classmethod
+    def setUpClass(cls):
+        cls.log = log_analyzer.LogFile(
+            path=LOG_PATH, date=dt.datetime(2019, 1, 2), extension="log"
         )
-
-        self.invalid_extension_log = log_analyzer.LogFile(
-            path=log_path,
-            date=dt.datetime.strptime("20190102", "%Y%m%d"),
-            extension="bz",
+        cls.invalid_extension_log = log_analyzer.LogFile(
+            path=LOG_PATH, date=dt.datetime(2019, 1, 2), extension="bz"
         )
-
-        invalid_log_path = os.path.abspath(
-            os.path.join(
-                FIXTURES_PATH,
-                "valid_filenames",
-                "nginx-access-ui.log-20180101.log",
-            )
-        )
-        self.invalid_log = log_analyzer.LogFile(
-            path=invalid_log_path,
-            date=dt.datetime.strptime("20180101", "%Y%m%d"),
+        cls.invalid_log = log_analyzer.LogFile(
+            path=INVALID_LOG_PATH,
+            date=dt.datetime(2018, 1, 1),
             extension="log",
         )
-
-        empty_log_path = os.path.abspath(
-            os.path.join(
-                FIXTURES_PATH,
-                "valid_filenames",
-                "nginx-access-ui.log-20170101.log",
-            )
+        cls.empty_log = log_analyzer.LogFile(
+            path=EMPTY_LOG_PATH, date=dt.datetime(2017, 1, 1), extension="log"
         )
-        self.empty_log = log_analyzer.LogFile(
-            path=empty_log_path,
-            date=dt.datetime.strptime("20170101", "%Y%m%d"),
+        cls.encoding_log = log_analyzer.LogFile(
+            path=ENCODING_LOG_PATH,
+            date=dt.datetime(2016, 1, 1),
             extension="log",
         )
 
-        encoding_log_path = os.path.abspath(
-            os.path.join(
-                FIXTURES_PATH,
-                "valid_filenames",
-                "nginx-access-ui.log-20160101.log",
-            )
-        )
-        self.encoding_log = log_analyzer.LogFile(
-            path=encoding_log_path,
-            date=dt.datetime.strptime("20160101", "%Y%m%d"),
-            extension="log",
-        )
+        cls.aggregate = log_analyzer._aggregate_stats_by_url(cls.log, 0.4)
+        cls.stats = log_analyzer._get_top_stats(cls.aggregate)
 
-    def test_median(self):
+    def test_median_empty(self):
         with self.assertRaises(AssertionError):
             log_analyzer._median([])
 
+    def test_median(self):
         self.assertEqual(1, log_analyzer._median([1]))
         self.assertEqual(1, log_analyzer._median([1, 1, 1]))
         self.assertEqual(4, log_analyzer._median([1, 4, 4, 4, 1]))
         self.assertEqual(3.5, log_analyzer._median([1, 2, 3, 4, 5, 6]))
+        self.assertEqual(101, log_analyzer._median(range(201, 0, -1)))
+        self.assertEqual(100.5, log_analyzer._median(range(200, 0, -1)))
+
+    def test_median_random(self):
+        rng = random.Random(42)
+
+        for size in (1, 2, 3, 10, 99, 100, 101, 1000, 1001):
+            # Values are rounded so that long lists contain ties
+            values = array(
+                "d", (round(rng.uniform(0, 10), 1) for _ in range(size))
+            )
+            sorted_values = sorted(values)
+            expected = 0.5 * (
+                sorted_values[(size - 1) // 2] + sorted_values[size // 2]
+            )
+            self.assertAlmostEqual(expected, log_analyzer._median(values))
 
     def test_invalid_logs_directory(self):
         invalid_path = os.path.join(FIXTURES_PATH, "foobar")
@@ -89,44 +95,196 @@ class TestCore(unittest.TestCase):
         self.assertIs(None, log_analyzer.find_most_recent_log(empty_directory))
 
     def test_find_most_recent_log(self):
-        logs_directory = os.path.join(FIXTURES_PATH, "valid_filenames")
+        actual_path, actual_date, actual_ext = log_analyzer.find_most_recent_log(
+            VALID_FILENAMES_PATH
+        )
+
+        self.assertEqual(LOG_PATH, actual_path)
+        self.assertEqual(dt.datetime(2019, 1, 2), actual_date)
+        self.assertEqual("log", actual_ext)
+
+    def test_find_most_recent_log_invalid_dates(self):
+        logs_directory = os.path.join(FIXTURES_PATH, "invalid_dates")
         expected_path = os.path.join(
-            logs_directory, "nginx-access-ui.log-20190102.log"
+            logs_directory, "nginx-access-ui.log-20190101.gz"
         )
-        expected_date = dt.datetime(2019, 1, 2)
 
         actual_path, actual_date, actual_ext = log_analyzer.find_most_recent_log(
             logs_directory
         )
 
         self.assertEqual(expected_path, actual_path)
-        self.assertEqual(expected_date, actual_date)
-        self.assertEqual("log", actual_ext)
+        self.assertEqual(dt.datetime(2019, 1, 1), actual_date)
+        self.assertEqual("gz", actual_ext)
+
+    def test_parse_line(self):
+        line = (
+            b'1.196.116.32 -  - [29/Jun/2017:03:50:22 +0300] '
+            b'"GET /api/aaa HTTP/1.1" 200 927 "-" "-" "-" "-" "-" 0.390\n'
+        )
+        url, time = log_analyzer._parse_line(line)
+        self.assertEqual(b"/api/aaa", url)
+        self.assertAlmostEqual(0.39, time)
+
+        self.assertIs(None, log_analyzer._parse_line(b"invalid line\n"))
+        self.assertIs(None, log_analyzer._parse_line(b"\n"))
+        self.assertIs(
+            None,
+            log_analyzer._parse_line(
+                b'1.196.116.32 -  - [29/Jun/2017:03:50:22 +0300] "0" 400 '
+                b'19 "-" "-" "-" "-" "-" 0.001\n'
+            ),
+        )
+        self.assertIs(
+            None,
+            log_analyzer._parse_line(
+                b'1.196.116.32 -  - [29/Jun/2017:03:50:22 +0300] '
+                b'"GET /api/aaa HTTP/1.1" 200 927 "-" "-" "-" "-" "-" -\n'
+            ),
+        )
+
+        prefix = (
+            b'1.196.116.32 -  - [29/Jun/2017:03:50:22 +0300] '
+            b'"GET /api/aaa HTTP/1.1" 200 927 "-" "-" "-" "-" "-" '
+        )
+        for time in (b"nan", b"inf", b"-1", b"1e3", b"1_0", b"12", b".5"):
+            self.assertIs(
+                None, log_analyzer._parse_line(prefix + time + b"\n"), time
+            )
+        self.assertIs(
+            None, log_analyzer._parse_line(b'xx] "GET /a HTTP/1.1" 0.5\n')
+        )
+        self.assertIs(
+            None,
+            log_analyzer._parse_line(b'xx] "GET /a HTTP/1.1" 20 1 0.5\n'),
+        )
+        self.assertEqual(
+            (b"/a", 0.5),
+            log_analyzer._parse_line(b'xx] "GET /a HTTP/1.1" 200 1 0.5'),
+        )
+
+    def test_iterate_over_chunks(self):
+        f = io.BytesIO(b"first\n\nsecond line\nthird\n")
+        chunks = list(log_analyzer._iterate_over_chunks(f, chunk_size=4))
+        self.assertEqual([b"first\n", b"second line", b"third"], chunks)
+
+        f = io.BytesIO(b"first\nsecond")
+        lines = list(log_analyzer._iterate_over_lines(f, chunk_size=3))
+        self.assertEqual([b"first", b"second"], lines)
+
+    def test_iterate_over_mapped_chunks(self):
+        with open(self.log.path, "rb") as f:
+            expected = f.read().split(b"\n")[:-1]
+
+        for chunk_size in (1, 7, 100, 10000):
+            with closing(log_analyzer._open_log(self.log)) as f:
+                lines = list(log_analyzer._iterate_over_lines(f, chunk_size))
+            self.assertEqual(expected, lines)
 
     def test_iterate_over_requests_invalid_extension(self):
         with self.assertRaises(ValueError):
-            list(
+            next(
                 log_analyzer._iterate_over_requests(self.invalid_extension_log)
             )
 
     def test_iterate_over_requests(self):
-        self.assertEqual(
-            4,
-            sum(
-                request is None
-                for request in log_analyzer._iterate_over_requests(self.log)
-            ),
-        )
+        invalid = 0
+        for request in log_analyzer._iterate_over_requests(self.log):
+            if request is None:
+                invalid += 1
+        self.assertEqual(4, invalid)
 
     def test_aggregate_stats_by_url(self):
-        count_valid, time_all, times = log_analyzer._aggregate_stats_by_url(
-            self.log, 0.4
-        )
+        count_valid, time_all, times = self.aggregate
 
         self.assertEqual(8, count_valid)
         self.assertAlmostEqual(3.4, time_all)
         self.assertEqual(6, len(times["/api/bbb"]))
 
+    def _patch(self, name, value):
+        """Replaces module-level constant of `log_analyzer` for one test."""
+        original = getattr(log_analyzer, name)
+        self.addCleanup(setattr, log_analyzer, name, original)
+        setattr(log_analyzer, name, value)
+
+    def assertAggregateEqual(self, expected, actual):
+        expected_count, expected_time, expected_times = expected
+        actual_count, actual_time, actual_times = actual
+
+        self.assertEqual(expected_count, actual_count)
+        self.assertAlmostEqual(expected_time, actual_time)
+        self.assertEqual(expected_times, actual_times)
+
+    def test_aggregate_stats_by_url_workers(self):
+        # Small chunks make workers get several ranges to merge
+        self._patch("PARALLEL_CHUNK_SIZE", 50)
+
+        for workers in (2, 3):
+            aggregate = log_analyzer._aggregate_stats_by_url(
+                self.log, 0.4, workers=workers
+            )
+            self.assertAggregateEqual(self.aggregate, aggregate)
+
+    def test_aggregate_stats_by_url_workers_gz(self):
+        log_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, log_dir)
+        gz_path = os.path.join(log_dir, "nginx-access-ui.log-20190102.gz")
+
+        with open(self.log.path, "rb") as src:
+            with closing(gzip.open(gz_path, "wb")) as dst:
+                dst.write(src.read())
+
+        gz_log = self.log._replace(path=gz_path, extension="gz")
+        self._patch("PARALLEL_CHUNK_SIZE", 50)
+
+        for workers in (2, 3):
+            aggregate = log_analyzer._aggregate_stats_by_url(
+                gz_log, 0.4, workers=workers
+            )
+            self.assertAggregateEqual(self.aggregate, aggregate)
+
+    def test_aggregate_stats_by_url_early_check(self):
+        log_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, log_dir)
+        log_path = os.path.join(log_dir, "nginx-access-ui.log-20190102.log")
+
+        valid_line = (
+            b'1.196.116.32 -  - [29/Jun/2017:03:50:22 +0300] '
+            b'"GET /api/aaa HTTP/1.1" 200 927 "-" "-" "-" "-" "-" 0.390\n'
+        )
+
+        # 20% of invalid rows in total, all of them at the beginning
+        with open(log_path, "wb") as f:
+            f.write(b"invalid line\n" * 10)
+            f.write(valid_line * 40)
+
+        log = self.log._replace(path=log_path)
+        self._patch("EARLY_CHECK_MIN_ROWS", 5)
+
+        # The log-file is a single part for any number of workers.
+        # 20% of invalid rows is under both the early (1.5 * 0.3)
+        # and the final (0.3) thresholds, small read blocks do not
+        # make the serial path check the first blocks on their own.
+        self._patch("READ_CHUNK_SIZE", 100)
+        for workers in (1, 2):
+            aggregate = log_analyzer._aggregate_stats_by_url(
+                log, 0.3, workers=workers
+            )
+            self.assertEqual(40, aggregate[0])
+
+        # The first parts contain invalid rows only
+        self._patch("PARALLEL_CHUNK_SIZE", 100)
+        self._patch("READ_CHUNK_SIZE", 30)
+        for workers in (1, 2):
+            with self.assertRaises(ValueError):
+                log_analyzer._aggregate_stats_by_url(
+                    log, 0.3, workers=workers
+                )
+
+        # 1/3 of rows are invalid, it is under the margin of 1.5 * 0.4
+        aggregate = log_analyzer._aggregate_stats_by_url(self.log, 0.4)
+        self.assertAggregateEqual(self.aggregate, aggregate)
+
     def test_aggregate_stats_by_url_part_invalid(self):
         with self.assertRaises(ValueError):
             log_analyzer._aggregate_stats_by_url(self.log)
@@ -136,32 +294,31 @@ class TestCore(unittest.TestCase):
             log_analyzer.get_request_stats(self.log)
 
     def test_get_request_stats_count(self):
-        self.assertEqual(
-            0, len(log_analyzer.get_request_stats(self.log, 0, 0.5))
-        )
-        self.assertEqual(
-            1, len(log_analyzer.get_request_stats(self.log, 1, 0.5))
-        )
-        self.assertEqual(
-            2, len(log_analyzer.get_request_stats(self.log, 2, 0.5))
-        )
-        self.assertEqual(
-            3, len(log_analyzer.get_request_stats(self.log, 3, 0.5))
-        )
+        for count in (0, 1, 2, 3):
+            self.assertEqual(
+                count, len(log_analyzer._get_top_stats(self.aggregate, count))
+            )
+
+        stats = log_analyzer.get_request_stats(self.log, 2, 0.5)
+        self.assertEqual(self.stats[:2], stats)
 
     def test_get_request_stats(self):
-        stats = log_analyzer.get_request_stats(
-            self.log, allowed_invalid_part=0.5
-        )
+        stat = self.stats[0]
+        self.assertEqual("/api/bbb", stat.url)
+        self.assertEqual(6, stat.count)
 
-        self.assertEqual("/api/bbb", stats[0].url)
-        self.assertEqual(6, stats[0].count)
-        self.assertAlmostEqual(0.5, stats[0].time_med)
-        self.assertAlmostEqual(0.8, stats[0].time_max)
-        self.assertAlmostEqual(0.5, stats[0].time_avg)
-        self.assertAlmostEqual(3.0, stats[0].time_sum)
-        self.assertAlmostEqual(100 * (3.0 / 3.4), stats[0].time_perc)
-        self.assertAlmostEqual(75, stats[0].count_perc)
+        expected = (
+            ("time_med", 0.5),
+            ("time_max", 0.8),
+            ("time_avg", 0.5),
+            ("time_sum", 3.0),
+            ("time_perc", 100 * (3.0 / 3.4)),
+            ("count_perc", 75),
+        )
+        for field, expected_value in expected:
+            self.assertAlmostEqual(
+                expected_value, getattr(stat, field), msg=field
+            )
 
     def test_get_request_stats_invalid_file(self):
         with self.assertRaises(ValueError):
@@ -180,3 +337,18 @@ class TestCore(unittest.TestCase):
     def test_get_request_stats_encoding_file(self):
         with self.assertRaises(UnicodeDecodeError):
             log_analyzer.get_request_stats(self.encoding_log, 0.5)
+
+    def test_write_report(self):
+        report_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, report_dir)
+        report_path = os.path.join(report_dir, "report.html")
+
+        log_analyzer.write_report(self.stats, to=report_path)
+
+        with open(report_path, "rb") as f:
+            report = f.read().decode("utf-8")
+        self.assertNotIn("$table_json", report)
+
+        table_json = report.split("var table = ", 1)[1].split(";\n", 1)[0]
+        table = json.loads(table_json)
+        self.assertEqual([stat._asdict() for stat in self.stats], table)